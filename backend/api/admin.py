@@ -15,14 +15,21 @@ class CustomUserAdmin(UserAdmin):
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
 
 
 class RecipeAdmin(admin.ModelAdmin):
     inlines = (RecipeIngredientInline,)
-    list_filter = ('author', 'name', 'tags')
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username', 'author__email')
+    autocomplete_fields = ('author',)
 
     def in_favorite(self, obj):
-        return Favorite.objects.filter(recipes=obj).count()
+        return obj.favorites_count
 
     def get_fields(self, request, obj=None):
         if obj is not None:
@@ -43,11 +50,29 @@ class IngredientAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
+class RecipeIngredientAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('user', 'follower')
+    list_select_related = ('user', 'follower')
+    autocomplete_fields = ('user', 'follower')
+
+
+class UserRecipeAdmin(admin.ModelAdmin):
+    list_display = ('user', 'recipes')
+    list_select_related = ('user', 'recipes')
+    autocomplete_fields = ('user', 'recipes')
+
+
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag)
 admin.site.register(Recipe, RecipeAdmin)
-admin.site.register(RecipeIngredient)
-admin.site.register(Follow)
-admin.site.register(Favorite)
-admin.site.register(ShoppingCart)
+admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
+admin.site.register(Follow, FollowAdmin)
+admin.site.register(Favorite, UserRecipeAdmin)
+admin.site.register(ShoppingCart, UserRecipeAdmin)
@@ -0,0 +1,44 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_CACHE_KEY = 'auth_token:{}'
+
+token_cache = caches['tokens']
+
+
+def get_token_cache_key(key):
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def forget_tokens(keys):
+    '''Удаление токенов из кэша после выхода или изменения пользователя'''
+    token_cache.delete_many([get_token_cache_key(key) for key in keys])
+
+
+def forget_user_tokens(user):
+    forget_tokens(
+        Token.objects.filter(user=user).values_list('key', flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''Аутентификация по токену с кэшированием токена вместе с пользователем.
+
+    Токены хранятся в кэше процесса на TOKEN_CACHE_TIMEOUT секунд, так
+    что запрос не обращается ни к базе, ни к общему кэшу. Выход в другом
+    процессе вступает в силу здесь не позже, чем через это время.
+    request.user - снимок из кэша, сохранять его нельзя: изменения
+    пользователя делаются над объектом, заново прочитанным из базы.
+    '''
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        token = token_cache.get(cache_key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(cache_key, token, settings.TOKEN_CACHE_TIMEOUT)
+        return token.user, token
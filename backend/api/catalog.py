@@ -0,0 +1,158 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from .models import Ingredient, Tag
+
+VERSION_KEY = 'catalog_version:{}'
+PREFIX_END = chr(0x10FFFF)
+
+# Версии, прочитанные из общего кэша: ключ -> (версия, момент устаревания)
+local_versions = {}
+
+
+def get_version(model):
+    '''Текущая версия справочника, общая для процессов через общий кэш.
+
+    Прочитанная версия запоминается в процессе на CATALOG_VERSION_TTL
+    секунд, чтобы не обращаться к общему кэшу на каждом запросе.
+    '''
+    key = VERSION_KEY.format(model._meta.label_lower)
+    now = time.monotonic()
+    version, expires = local_versions.get(key, (None, now))
+    if expires > now:
+        return version
+    version = cache.get_or_set(key, time.time_ns(), None)
+    local_versions[key] = (version, now + settings.CATALOG_VERSION_TTL)
+    return version
+
+
+def bump_version(model):
+    '''Смена версии справочника после изменения его записей'''
+    key = VERSION_KEY.format(model._meta.label_lower)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+    local_versions.pop(key, None)
+
+
+class VersionedCatalog:
+    '''Данные справочника в памяти процесса, привязанные к его версии'''
+    model = None
+
+    def __init__(self):
+        self.version = None
+        self.data = None
+        self.lock = threading.Lock()
+
+    def build(self):
+        raise NotImplementedError
+
+    def get_data(self):
+        version = get_version(self.model)
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.data = self.build()
+                    self.version = version
+        return self.data
+
+
+class IngredientIndex(VersionedCatalog):
+    '''Индекс ингредиентов в памяти процесса для поиска по названию.
+
+    Названия хранятся отсортированными без учёта регистра, поэтому
+    совпадения по началу названия находятся бинарным поиском. Индекс
+    перестраивается, когда меняется версия справочника ингредиентов.
+    '''
+    model = Ingredient
+
+    def build(self):
+        ingredients = sorted(
+            (name.casefold(), pk, name, unit)
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        keys = [ingredient[0] for ingredient in ingredients]
+        entries = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, pk, name, unit in ingredients
+        ]
+        return keys, entries
+
+    def search(self, name):
+        '''Сначала ингредиенты, начинающиеся с name, затем содержащие его'''
+        keys, entries = self.get_data()
+        name = name.casefold()
+        start = bisect_left(keys, name)
+        end = bisect_left(keys, name + PREFIX_END, start)
+        contains = [
+            entry for key, entry in zip(keys, entries)
+            if name in key and not key.startswith(name)
+        ]
+        return entries[start:end] + contains
+
+
+class TagCatalog(VersionedCatalog):
+    '''Соответствие слагов тегов их id без обращения к базе'''
+    model = Tag
+
+    def build(self):
+        return {
+            slug.lower(): pk
+            for pk, slug in Tag.objects.values_list('id', 'slug')
+        }
+
+    def get_ids(self, slugs):
+        ids_by_slug = self.get_data()
+        return [
+            ids_by_slug[slug.lower()]
+            for slug in slugs if slug.lower() in ids_by_slug
+        ]
+
+
+ingredient_index = IngredientIndex()
+tag_catalog = TagCatalog()
+
+
+class CatalogCache:
+    '''Готовый JSON справочников вместе с версией, для которой он собран'''
+
+    def __init__(self):
+        self.responses = {}
+        self.lock = threading.Lock()
+
+    def get(self, model, serializer_class):
+        version = get_version(model)
+        label = model._meta.label_lower
+        cached = self.responses.get(label)
+        if cached is None or cached[0] != version:
+            serializer = serializer_class(model.objects.all(), many=True)
+            content = JSONRenderer().render(serializer.data)
+            cached = (version, content)
+            with self.lock:
+                self.responses[label] = cached
+        return cached
+
+
+catalog_cache = CatalogCache()
+
+
+def catalog_response(request, model, serializer_class):
+    '''Ответ со всем справочником, 304 если у клиента та же версия'''
+    version, content = catalog_cache.get(model, serializer_class)
+    etag = quote_etag(f'{model._meta.model_name}-{version}')
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    return response
@@ -0,0 +1,52 @@
+from django.db.models import (Count, F, IntegerField, OuterRef, Q,
+                              Subquery)
+from django.db.models.functions import Coalesce
+
+from .models import update_counter
+
+# Модель, поле счётчика, модель и поле, по которым он считается
+COUNTERS = (
+    ('Recipe', 'favorites_count', 'Favorite', 'recipes'),
+    ('Recipe', 'shopping_cart_count', 'ShoppingCart', 'recipes'),
+    ('User', 'recipes_count', 'Recipe', 'author'),
+    ('User', 'followers_count', 'Follow', 'user'),
+)
+
+
+def actual_count(model, field):
+    '''Подзапрос с настоящим числом записей model для каждого объекта'''
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def update_counters(instance, delta):
+    '''Изменение счётчиков, которые считаются по записям модели instance'''
+    meta = instance._meta
+    for model_name, counter, source_name, field in COUNTERS:
+        if source_name == meta.object_name:
+            pk = getattr(instance, meta.get_field(field).attname)
+            update_counter(
+                meta.apps.get_model('api', model_name), pk, counter, delta
+            )
+
+
+def reconcile_counters(get_model):
+    '''Исправление разошедшихся счётчиков.
+
+    Возвращает число исправленных объектов для каждого счётчика.
+    '''
+    fixed = {}
+    for model_name, counter, source_name, field in COUNTERS:
+        model = get_model('api', model_name)
+        source = get_model('api', source_name)
+        drifted = model.objects.annotate(
+            actual=actual_count(source, field)
+        ).filter(~Q(**{counter: F('actual')}))
+        fixed[f'{model_name}.{counter}'] = model.objects.filter(
+            pk__in=drifted.values('pk')
+        ).update(**{counter: actual_count(source, field)})
+    return fixed
@@ -0,0 +1,100 @@
+import base64
+import binascii
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from PIL import Image
+
+CHUNK_SIZE = 64 * 1024
+HEADER = ';base64,'
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+
+
+def decoded_size(data, start):
+    '''Размер файла после декодирования без учёта пробелов'''
+    return (len(data) - start) * 3 // 4
+
+
+def decode_chunks(data, start):
+    '''Декодирует base64 кусками, не создавая копию всей строки'''
+    rest = ''
+    for offset in range(start, len(data), CHUNK_SIZE):
+        chunk = rest + ''.join(data[offset:offset + CHUNK_SIZE].split())
+        end = len(chunk) - len(chunk) % 4
+        yield base64.b64decode(chunk[:end], validate=True)
+        rest = chunk[end:]
+    if rest:
+        raise binascii.Error('Incorrect padding')
+
+
+class StreamedBase64ImageField(Base64ImageField):
+    '''Картинка в base64 с ограничением размера.
+
+    Размер проверяется до декодирования, строка декодируется кусками во
+    временный файл, а формат и размеры картинки читаются из заголовка
+    без распаковки пикселей.
+    '''
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        content_type, start = self.parse_header(base64_data)
+        size = self.check_size(base64_data, start)
+        file = TemporaryUploadedFile(
+            str(uuid.uuid4()), content_type, size, None
+        )
+        try:
+            try:
+                for chunk in decode_chunks(base64_data, start):
+                    file.write(chunk)
+            except (binascii.Error, ValueError):
+                raise ValidationError(self.INVALID_FILE_MESSAGE)
+            file.size = file.tell()
+            file.name += '.' + self.get_image_extension(file)
+            return super(Base64FieldMixin, self).to_internal_value(file)
+        except Exception:
+            file.close()
+            raise
+
+    def parse_header(self, data):
+        '''Тип из заголовка data: и начало base64 после него'''
+        start = data.find(HEADER, 0, 256)
+        if start == -1:
+            return None, 0
+        content_type = None
+        if self.trust_provided_content_type:
+            content_type = data[:start].replace('data:', '')
+        return content_type, start + len(HEADER)
+
+    def check_size(self, data, start):
+        '''Размер файла после декодирования, не больше допустимого'''
+        size = decoded_size(data, start)
+        if size > settings.MAX_IMAGE_UPLOAD_SIZE:
+            raise ValidationError(
+                'Размер картинки не должен превышать '
+                f'{settings.MAX_IMAGE_UPLOAD_SIZE} байт'
+            )
+        return size
+
+    def get_image_extension(self, file):
+        '''Расширение по заголовку картинки с проверкой её размеров'''
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                image_format, (width, height) = image.format, image.size
+        except (OSError, Image.DecompressionBombError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        if image_format not in IMAGE_FORMATS:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        if width * height > settings.MAX_IMAGE_PIXELS:
+            raise ValidationError(
+                'Картинка не должна содержать больше '
+                f'{settings.MAX_IMAGE_PIXELS} пикселей'
+            )
+        file.seek(0)
+        return IMAGE_FORMATS[image_format]
@@ -1,44 +1,59 @@
-from django_filters.filters import (AllValuesMultipleFilter, ChoiceFilter,
+from django import forms
+from django.db.models import Exists, OuterRef
+from django_filters.filters import (ChoiceFilter, MultipleChoiceFilter,
                                     NumberFilter)
 from django_filters.rest_framework import FilterSet
 
-from .models import Recipe
+from .catalog import tag_catalog
+from .models import Favorite, Recipe, ShoppingCart
 
 choices = (('false', 'false'), ('true', 'true'))
 
 
+class SlugsField(forms.MultipleChoiceField):
+    '''Список слагов, которые проверяются при фильтрации, а не в форме'''
+
+    def valid_value(self, value):
+        return True
+
+
+class SlugsFilter(MultipleChoiceFilter):
+    field_class = SlugsField
+
+
 class CustomFilter(FilterSet):
     author = NumberFilter(field_name='author')
-    tags = AllValuesMultipleFilter(
-        field_name='tags__slug', lookup_expr='iexact'
-    )
+    tags = SlugsFilter(method='filter_tags')
     is_favorited = ChoiceFilter(method='filter_is_favorited', choices=choices)
     is_in_shopping_cart = ChoiceFilter(
         method='filter_is_in_shopping_cart', choices=choices
     )
 
-    def filter_is_favorited(self, queryset, name, value):
-        user = self.request.user
-        if user.is_authenticated:
-            if value == 'true':
-                recipes = Recipe.objects.filter(favorite_recipes__user=user)
-                return queryset & recipes
-            elif value == 'false':
-                recipes = Recipe.objects.exclude(favorite_recipes__user=user)
-                return queryset & recipes
-        return queryset
+    def filter_tags(self, queryset, name, value):
+        tag_ids = tag_catalog.get_ids(value)
+        if not tag_ids:
+            return queryset.none()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=tag_ids
+        )))
 
-    def filter_is_in_shopping_cart(self, queryset, name, value):
+    def filter_by_user_relation(self, queryset, model, value):
+        '''Рецепты, которые есть (true) или которых нет (false) в model'''
         user = self.request.user
-        if user.is_authenticated:
-            if value == 'true':
-                recipes = Recipe.objects.filter(cart_recipes__user=user)
-                return queryset & recipes
-            elif value == 'false':
-                recipes = Recipe.objects.exclude(cart_recipes__user=user)
-                return queryset & recipes
-        else:
+        if not user.is_authenticated or value not in ('true', 'false'):
             return queryset
+        in_relation = Exists(model.objects.filter(
+            user=user, recipes=OuterRef('pk')
+        ))
+        if value == 'true':
+            return queryset.filter(in_relation)
+        return queryset.filter(~in_relation)
+
+    def filter_is_favorited(self, queryset, name, value):
+        return self.filter_by_user_relation(queryset, Favorite, value)
+
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_by_user_relation(queryset, ShoppingCart, value)
 
     class Meta:
         model = Recipe
@@ -0,0 +1,102 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+RENDITIONS = {
+    'thumbnail': (320, 320),
+    'medium': (960, 960),
+}
+RENDITION_FORMAT = 'WEBP'
+RENDITION_QUALITY = 80
+CHUNK_SIZE = 64 * 1024
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_RENDITION_WORKERS,
+    thread_name_prefix='renditions'
+)
+
+
+def content_hash(image):
+    '''sha256 содержимого файла, читаемого кусками'''
+    digest = hashlib.sha256()
+    with image.open('rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def rendition_name(digest, rendition):
+    return f'recipes/renditions/{digest[:2]}/{digest}-{rendition}.webp'
+
+
+def render(source, size):
+    '''Уменьшенная копия картинки в формате WebP'''
+    image = ImageOps.exif_transpose(source)
+    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    image.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def build_renditions(recipe_id):
+    '''Строит уменьшенные копии картинки рецепта и запоминает её хеш.
+
+    Копии названы по хешу содержимого, как и оригиналы в
+    ContentAddressedStorage, поэтому одинаковые картинки разных
+    рецептов хранятся один раз. Хеш записывается, только если картинка
+    не сменилась, пока строились копии. Дата изменения рецепта
+    обновляется, чтобы клиенты получили ссылки на копии вместо ответа 304.
+    '''
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return None
+    digest = content_hash(recipe.image)
+    missing = [
+        rendition for rendition in RENDITIONS
+        if not default_storage.exists(rendition_name(digest, rendition))
+    ]
+    if missing:
+        with recipe.image.open('rb') as file, Image.open(file) as source:
+            for rendition in missing:
+                default_storage.save(
+                    rendition_name(digest, rendition),
+                    render(source, RENDITIONS[rendition])
+                )
+    Recipe.objects.filter(pk=recipe_id, image=recipe.image.name).update(
+        image_hash=digest, updated_at=timezone.now()
+    )
+    return digest
+
+
+def build_in_background(recipe_id):
+    try:
+        build_renditions(recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_renditions(recipe_id):
+    '''Ставит построение копий в очередь после фиксации транзакции'''
+    transaction.on_commit(
+        lambda: executor.submit(build_in_background, recipe_id)
+    )
+
+
+def rendition_urls(digest):
+    '''Ссылки на копии картинки или None, если они ещё не готовы'''
+    if not digest:
+        return None
+    return {
+        rendition: default_storage.url(rendition_name(digest, rendition))
+        for rendition in RENDITIONS
+    }
@@ -0,0 +1,54 @@
+import time
+
+from api.models import User
+from api.views import NewObtainAuthToken
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+
+
+class Command(BaseCommand):
+    help = 'Measure CPU spent on bad logins with and without throttling'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=200)
+
+    def attack(self, email, address, attempts):
+        client = APIClient(REMOTE_ADDR=address)
+        started = time.process_time()
+        rejected = 0
+        for _ in range(attempts):
+            response = client.post(
+                '/api/auth/token/login/',
+                {'email': email, 'password': 'wrong-password'},
+                format='json'
+            )
+            rejected += response.status_code == 429
+        return time.process_time() - started, rejected
+
+    def handle(self, *args, **options):
+        attempts = options['attempts']
+        stamp = time.time_ns()
+        throttle_classes = NewObtainAuthToken.throttle_classes
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=f'throttle-{stamp}', email=f'throttle-{stamp}@x.ru',
+                first_name=f'throttle-{stamp}', last_name=f'throttle-{stamp}',
+                password='correct-password'
+            )
+            try:
+                NewObtainAuthToken.throttle_classes = []
+                without, _ = self.attack(user.email, '10.0.0.1', attempts)
+            finally:
+                NewObtainAuthToken.throttle_classes = throttle_classes
+            with_limit, rejected = self.attack(
+                user.email, '10.0.0.2', attempts
+            )
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f'without throttling: {without:.2f} s CPU for {attempts} attempts'
+        )
+        self.stdout.write(
+            f'with throttling: {with_limit:.2f} s CPU for {attempts} attempts,'
+            f' {rejected} rejected before hashing'
+        )
@@ -0,0 +1,68 @@
+import time
+from collections import OrderedDict
+
+from api.models import Recipe, User
+from api.representations import represent_recipe
+from api.serializers import ShowRecipeSerializer
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+
+def render_with_serializer(recipes, request):
+    '''Прежний способ отображения через поля ShowRecipeSerializer'''
+    data = []
+    for instance in recipes:
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        ret = OrderedDict()
+        fields = ShowRecipeSerializer(instance, context={'request': request})
+        for field in fields:
+            attribute = field.get_attribute(instance)
+            if attribute is None:
+                ret[field.field_name] = None
+            else:
+                ret[field.field_name] = field.to_representation(attribute)
+        data.append(ret)
+    return data
+
+
+def render_fast(recipes, request):
+    return [represent_recipe(recipe, request) for recipe in recipes]
+
+
+class Command(BaseCommand):
+    help = 'Compare recipe list rendering through serializers and fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--user', type=int, help='id of the viewer')
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().get('/api/recipes/')
+        if options['user'] is not None:
+            request.user = User.objects.get(id=options['user'])
+        else:
+            request.user = AnonymousUser()
+        recipes = list(
+            Recipe.objects.with_related(request.user)[:options['limit']]
+        )
+        if not recipes:
+            raise CommandError('No recipes in the database')
+        renderer = JSONRenderer()
+        results = {}
+        for render in (render_with_serializer, render_fast):
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                content = renderer.render(render(recipes, request))
+            elapsed = (time.perf_counter() - start) / options['repeat']
+            results[render.__name__] = content
+            self.stdout.write(
+                f'{render.__name__}: {elapsed * 1000:.2f} ms '
+                f'for {len(recipes)} recipes'
+            )
+        if results['render_with_serializer'] != results['render_fast']:
+            raise CommandError('Outputs differ')
+        self.stdout.write(self.style.SUCCESS('Outputs are identical'))
@@ -0,0 +1,35 @@
+import time
+
+from api.shopping_list import load_fonts, render_shopping_list
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Measure shopping list PDF time with and without cached fonts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def measure(self, ingredients, repeat, reload_fonts):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            if reload_fonts:
+                load_fonts()
+            render_shopping_list(ingredients).read()
+        return (time.perf_counter() - start) / repeat
+
+    def handle(self, *args, **options):
+        ingredients = [
+            {
+                'ingredient__name': f'ингредиент {number}',
+                'ingredient__measurement_unit': 'г',
+                'total': number,
+            }
+            for number in range(options['items'])
+        ]
+        render_shopping_list(ingredients)
+        before = self.measure(ingredients, options['repeat'], True)
+        after = self.measure(ingredients, options['repeat'], False)
+        self.stdout.write(f'fonts loaded per request: {before * 1000:.2f} ms')
+        self.stdout.write(f'fonts loaded once: {after * 1000:.2f} ms')
@@ -0,0 +1,22 @@
+from api.images import build_renditions
+from api.models import Recipe
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Build resized copies for recipe images that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true', help='Rebuild hashes for all recipes'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            recipes = recipes.filter(image_hash='')
+        built = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            if build_renditions(recipe_id):
+                built += 1
+        self.stdout.write(f'{built} recipes processed')
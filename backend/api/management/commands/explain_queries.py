@@ -0,0 +1,93 @@
+from api.models import Recipe, Tag, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN for the queries of every endpoint and flag full scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='user to make requests as')
+
+    def get_endpoints(self, user):
+        recipe = Recipe.objects.first()
+        tag = Tag.objects.first()
+        endpoints = [
+            '/api/recipes/',
+            '/api/recipes/?is_favorited=true',
+            '/api/recipes/?is_in_shopping_cart=true',
+            '/api/recipes/?is_favorited=false&is_in_shopping_cart=false',
+            f'/api/recipes/?author={user.id}',
+            '/api/recipes/?cursor=',
+            '/api/recipes/download_shopping_cart/?format=json',
+            '/api/users/',
+            '/api/users/subscriptions/',
+            '/api/users/subscriptions/?recipes_limit=3',
+            '/api/tags/',
+            '/api/ingredients/',
+            '/api/ingredients/?name=а',
+        ]
+        if recipe is not None:
+            endpoints.append(f'/api/recipes/{recipe.id}/')
+        if tag is not None:
+            endpoints.append(f'/api/recipes/?tags={tag.slug}')
+        return endpoints
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {sql}')
+                return [row[0] for row in cursor.fetchall()]
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return [row[-1] for row in cursor.fetchall()]
+        raise CommandError(f'Unsupported database: {connection.vendor}')
+
+    def is_full_scan(self, line, tables):
+        if connection.vendor == 'postgresql':
+            return 'Seq Scan' in line
+        words = line.split()
+        return (
+            words[:1] == ['SCAN'] and len(words) > 1
+            and words[1] in tables and 'USING' not in words
+        )
+
+    def handle(self, *args, **options):
+        if options['email']:
+            user = User.objects.get(email=options['email'])
+        else:
+            user = User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('Seed the database before explaining queries')
+        tables = set(connection.introspection.table_names())
+        client = APIClient()
+        client.force_authenticate(user)
+        flagged = 0
+        for endpoint in self.get_endpoints(user):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(endpoint)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{endpoint} -> {response.status_code}, '
+                f'{len(queries)} queries'
+            ))
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                scans = [
+                    line for line in self.explain(sql)
+                    if self.is_full_scan(line, tables)
+                ]
+                flagged += len(scans)
+                for line in scans:
+                    self.stdout.write(self.style.WARNING(
+                        f'  {line.strip()}\n    in: {sql[:200]}'
+                    ))
+        if flagged:
+            self.stdout.write(self.style.WARNING(f'Full scans: {flagged}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No full scans found'))
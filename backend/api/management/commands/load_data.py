@@ -1,17 +1,118 @@
 import csv
+import json
+import os
+import time
+from itertools import islice
 
+from api.catalog import bump_version
 from api.models import Ingredient
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+DEFAULT_PATH = os.path.join(
+    settings.BASE_DIR, 'api', 'data', 'ingredients.csv'
+)
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if row:
+                name, unit = row
+                yield name, unit
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as f:
+        for item in json.load(f):
+            yield item['name'], item['measurement_unit']
+
+
+READERS = {'.csv': read_csv, '.json': read_json}
 
 
 class Command(BaseCommand):
     help = 'Load ingredients data to DB'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=DEFAULT_PATH,
+            help='CSV (name,measurement_unit) or JSON file with ingredients'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--start', type=int, default=0,
+            help='number of rows to skip, to resume an interrupted load'
+        )
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='load a CSV file through COPY (PostgreSQL only)'
+        )
+
+    def load_batches(self, rows, batch_size, start):
+        '''Загрузка пачками, дубли отбрасываются в памяти и в базе'''
+        seen = set()
+        row_number = start
+        loaded = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return loaded
+            row_number += len(batch)
+            ingredients = []
+            for name, unit in batch:
+                if (name, unit) not in seen:
+                    seen.add((name, unit))
+                    ingredients.append(
+                        Ingredient(name=name, measurement_unit=unit)
+                    )
+            Ingredient.objects.bulk_create(
+                ingredients, ignore_conflicts=True
+            )
+            loaded += len(batch)
+            self.stdout.write(f'Processed rows: {row_number}')
+
+    @transaction.atomic
+    def load_copy(self, path):
+        '''Загрузка через COPY во временную таблицу и INSERT без дублей'''
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor, open(path, encoding='utf-8') as f:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_staging '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_staging FROM STDIN WITH (FORMAT csv)', f
+            )
+            cursor.execute('SELECT count(*) FROM ingredient_staging')
+            loaded = cursor.fetchone()[0]
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_staging '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+        return loaded
+
     def handle(self, *args, **options):
-        with open('api/data/ingredients.csv', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                name, unit = row
-                Ingredient.objects.get_or_create(
-                    name=name, measurement_unit=unit
-                )
+        path = options['path']
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in READERS:
+            raise CommandError('Only .csv and .json files are supported')
+        started = time.perf_counter()
+        if options['copy']:
+            if connection.vendor != 'postgresql' or extension != '.csv':
+                raise CommandError('COPY needs PostgreSQL and a CSV file')
+            loaded = self.load_copy(path)
+        else:
+            rows = islice(READERS[extension](path), options['start'], None)
+            loaded = self.load_batches(
+                rows, options['batch_size'], options['start']
+            )
+        bump_version(Ingredient)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {loaded} rows in {elapsed:.2f} s '
+            f'({loaded / elapsed if elapsed else loaded:.0f} rows/s)'
+        ))
@@ -0,0 +1,14 @@
+from api.counters import reconcile_counters
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = 'Recalculate denormalized counters that drifted from real counts'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile_counters(apps.get_model)
+        for counter, count in fixed.items():
+            self.stdout.write(f'{counter}: fixed {count}')
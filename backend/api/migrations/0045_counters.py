@@ -0,0 +1,57 @@
+# Generated by Django 3.0.5 on 2026-10-18 21:40
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+# Копия api.counters.COUNTERS на момент миграции
+COUNTERS = (
+    ('Recipe', 'favorites_count', 'Favorite', 'recipes'),
+    ('Recipe', 'shopping_cart_count', 'ShoppingCart', 'recipes'),
+    ('User', 'recipes_count', 'Recipe', 'author'),
+    ('User', 'followers_count', 'Follow', 'user'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for model_name, counter, source_name, field in COUNTERS:
+        model = apps.get_model('api', model_name)
+        source = apps.get_model('api', source_name)
+        counts = (
+            source.objects.filter(**{field: models.OuterRef('pk')})
+            .order_by().values(field).annotate(total=models.Count('pk'))
+            .values('total')
+        )
+        model.objects.update(**{counter: Coalesce(
+            models.Subquery(counts, output_field=models.IntegerField()), 0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0044_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число добавлений в список покупок'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
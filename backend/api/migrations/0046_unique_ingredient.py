@@ -0,0 +1,64 @@
+# Generated by Django 3.0.5 on 2026-10-18 22:05
+
+from django.db import migrations, models
+
+MAX_AMOUNT = 32767
+
+
+def merge_recipe_rows(RecipeIngredient, ingredient_ids):
+    '''Объединение строк рецепта с разными дублями одного ингредиента'''
+    rows = (
+        RecipeIngredient.objects.filter(ingredient__in=ingredient_ids)
+        .values('recipe')
+        .annotate(keep_id=models.Min('id'), total=models.Sum('amount'),
+                  count=models.Count('id'))
+        .filter(count__gt=1)
+    )
+    for row in rows:
+        RecipeIngredient.objects.filter(id=row['keep_id']).update(
+            amount=min(row['total'], MAX_AMOUNT)
+        )
+        RecipeIngredient.objects.filter(
+            recipe=row['recipe'], ingredient__in=ingredient_ids
+        ).exclude(id=row['keep_id']).delete()
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    '''Перенос ссылок с дублей ингредиентов на первый из них и удаление дублей'''
+    Ingredient = apps.get_model('api', 'Ingredient')
+    RecipeIngredient = apps.get_model('api', 'RecipeIngredient')
+    duplicates = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(first_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        others = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit']
+        ).exclude(id=duplicate['first_id'])
+        merge_recipe_rows(
+            RecipeIngredient,
+            [duplicate['first_id'], *others.values_list('id', flat=True)]
+        )
+        RecipeIngredient.objects.filter(ingredient__in=others).update(
+            ingredient_id=duplicate['first_id']
+        )
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0045_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
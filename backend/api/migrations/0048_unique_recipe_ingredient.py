@@ -0,0 +1,42 @@
+# Generated by Django 3.0.5 on 2026-10-19 10:20
+
+from django.db import migrations, models
+
+MAX_AMOUNT = 32767
+
+
+def merge_duplicate_rows(apps, schema_editor):
+    '''Объединение повторяющихся ингредиентов одного рецепта с суммой количества'''
+    RecipeIngredient = apps.get_model('api', 'RecipeIngredient')
+    duplicates = (
+        RecipeIngredient.objects.values('recipe', 'ingredient')
+        .annotate(keep_id=models.Min('id'), total=models.Sum('amount'),
+                  count=models.Count('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        RecipeIngredient.objects.filter(id=duplicate['keep_id']).update(
+            amount=min(duplicate['total'], MAX_AMOUNT)
+        )
+        RecipeIngredient.objects.filter(
+            recipe=duplicate['recipe'], ingredient=duplicate['ingredient']
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0047_recipe_image_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rows, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='recipeingredient',
+            name='recipeingr_recipe_ingr_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+    ]
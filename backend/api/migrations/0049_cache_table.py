@@ -0,0 +1,23 @@
+# Generated by Django 3.0.5 on 2026-10-19 11:05
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    '''Таблица для DatabaseCache, если он настроен в CACHES'''
+    call_command(
+        'createcachetable', database=schema_editor.connection.alias,
+        verbosity=0
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0048_unique_recipe_ingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.0.5 on 2026-10-19 11:40
+
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0049_cache_table'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, storage=api.storage.ContentAddressedStorage(), upload_to='recipes/', verbose_name='Картинка рецепта'),
+        ),
+    ]
@@ -1,12 +1,39 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.db.models.deletion import CASCADE
+from django.db.models.functions import Greatest, RowNumber
+from django.utils import timezone
 
 from .data import HEX, UNITS
+from .storage import ContentAddressedStorage
 from .validators import CustomMinValidator
 
 
-class User(AbstractUser):
+class CountersMixin:
+    '''Модель со счётчиками, которые меняет только update_counter.
+
+    Полное сохранение объекта не записывает счётчики, иначе оно вернуло
+    бы в базу устаревшие значения, прочитанные вместе с объектом.
+    '''
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                ]
+            kwargs['update_fields'] = [
+                name for name in update_fields
+                if name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CountersMixin, AbstractUser):
     email = models.EmailField(
         unique=True,
         error_messages={'unique': ('A user with that email already exists.')},
@@ -22,6 +49,14 @@ class User(AbstractUser):
     last_name = models.TextField(
         max_length=150, unique=True, verbose_name='Фамилия'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число подписчиков'
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -39,6 +74,9 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [models.UniqueConstraint(
+                       fields=['name', 'measurement_unit'],
+                       name='unique_ingredient')]
 
     def __str__(self):
         return self.name
@@ -61,14 +99,73 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self, user):
+        '''Рецепты со всеми данными, нужными для отображения пользователю'''
+        queryset = self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
+        )
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=models.Exists(Favorite.objects.filter(
+                    user=user, recipes=models.OuterRef('pk')
+                )),
+                is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                    user=user, recipes=models.OuterRef('pk')
+                )),
+                author_is_subscribed=models.Exists(Follow.objects.filter(
+                    user=models.OuterRef('author'), follower=user
+                ))
+            )
+        return queryset
+
+    def touch(self):
+        '''Обновление даты изменения рецептов без их сохранения'''
+        return self.update(updated_at=timezone.now())
+
+    def latest_by_author(self, authors, fields, limit=None):
+        '''Последние рецепты авторов одним запросом.
+
+        Если задан limit, рецепты нумеруются ROW_NUMBER() в пределах
+        автора и отбираются не больше limit на каждого. Сырой запрос
+        выбирает только те из fields, что являются столбцами рецепта.
+        '''
+        queryset = self.filter(author__in=authors).order_by('author', '-id')
+        if limit is None or not authors:
+            return queryset
+        columns = {field.attname for field in self.model._meta.concrete_fields}
+        numbered = queryset.order_by().annotate(row_number=models.Window(
+            expression=RowNumber(),
+            partition_by=[models.F('author')],
+            order_by=models.F('id').desc()
+        )).values(*dict.fromkeys(
+            name for name in ['id', 'author_id', *fields] if name in columns
+        ), 'row_number')
+        sql, params = numbered.query.sql_with_params()
+        return self.raw(
+            f'SELECT * FROM ({sql}) AS numbered '
+            'WHERE row_number <= %s ORDER BY author_id, id DESC',
+            params + (limit,)
+        )
+
+
+class Recipe(CountersMixin, models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='recipes',
         verbose_name='Автор рецепта'
     )
     name = models.CharField(max_length=150, verbose_name='Название рецепта')
     image = models.ImageField(
-        upload_to='recipes/', null=True, verbose_name='Картинка рецепта'
+        upload_to='recipes/', storage=ContentAddressedStorage(), null=True,
+        verbose_name='Картинка рецепта'
+    )
+    image_hash = models.CharField(
+        max_length=64, blank=True, editable=False,
+        verbose_name='Хеш картинки рецепта'
     )
     text = models.TextField(verbose_name='Описание рецепта')
     ingredients = models.ManyToManyField(
@@ -82,11 +179,30 @@ class Recipe(models.Model):
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления рецепта'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name='Дата изменения рецепта'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число добавлений в избранное'
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0, editable=False,
+        verbose_name='Число добавлений в список покупок'
+    )
+
+    counter_fields = ('favorites_count', 'shopping_cart_count')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['author', '-id'], name='recipe_author_id_desc_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -110,6 +226,8 @@ class RecipeIngredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент рецепта (промжуточная модель)'
         verbose_name_plural = 'Ингредиенты рецепта (промежуточная модель)'
+        constraints = [models.UniqueConstraint(fields=['recipe', 'ingredient'],
+                       name='unique_recipe_ingredient')]
 
     def __str__(self):
         return f'{self.recipe}: {self.ingredient} количеством {self.amount}'
@@ -147,6 +265,11 @@ class Follow(models.Model):
         verbose_name_plural = 'Избранные авторы'
         constraints = [models.UniqueConstraint(fields=['user', 'follower'],
                        name='unique_follower')]
+        indexes = [
+            models.Index(
+                fields=['follower', 'user'], name='follow_follower_user_idx'
+            ),
+        ]
 
 
 class ShoppingCart(models.Model):
@@ -164,3 +287,10 @@ class ShoppingCart(models.Model):
         verbose_name_plural = 'Списки покупок'
         constraints = [models.UniqueConstraint(fields=['user', 'recipes'],
                        name='unique_shopping_cart_recipe')]
+
+
+def update_counter(model, pk, field, delta):
+    '''Атомарное изменение счётчика на стороне базы, не ниже нуля'''
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(models.F(field) + delta, 0)}
+    )
@@ -0,0 +1,8 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FileFormatNegotiation(DefaultContentNegotiation):
+    '''Параметр format выбирает формат файла, а не рендерер ответа'''
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
@@ -1,6 +1,84 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from .catalog import get_version
+
+
+class CachedCountPaginator(Paginator):
+    '''Paginator, который берёт число объектов из кэша, если задан ключ'''
+
+    def __init__(self, *args, count_cache_key=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_cache_key = count_cache_key
+
+    @cached_property
+    def count(self):
+        if self.count_cache_key is None:
+            return super().count
+        count = cache.get(self.count_cache_key)
+        if count is None:
+            count = super().count
+            cache.set(
+                self.count_cache_key, count,
+                settings.PAGINATION_COUNT_CACHE_TIMEOUT
+            )
+        return count
+
+
+class CustomCursorPaginator(CursorPagination):
+    '''Постраничный вывод по курсору без подсчёта общего числа объектов'''
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+    ordering = '-id'
 
 
 class CustomPaginator(PageNumberPagination):
+    '''Номера страниц по умолчанию, курсор при наличии параметра cursor'''
     page_size = 10
     page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    cursor_paginator = None
+
+    def get_count_cache_key(self, queryset, request):
+        '''Ключ кэша числа объектов для анонимных запросов.
+
+        Включает путь, параметры фильтрации без номера и размера страницы
+        и версию модели, которая меняется при создании и удалении объектов.
+        '''
+        if request.user.is_authenticated:
+            return None
+        params = sorted(
+            (key, sorted(request.query_params.getlist(key)))
+            for key in request.query_params
+            if key not in (self.page_query_param, self.page_size_query_param)
+        )
+        params_hash = hashlib.md5(json.dumps(params).encode()).hexdigest()
+        return 'page_count:{}:{}:{}'.format(
+            request.path, get_version(queryset.model), params_hash
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = CustomCursorPaginator()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        self.django_paginator_class = partial(
+            CachedCountPaginator,
+            count_cache_key=self.get_count_cache_key(queryset, request)
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,108 @@
+from collections import OrderedDict
+
+from .images import rendition_urls
+from .models import Favorite, Follow, ShoppingCart
+
+
+def is_authenticated(request):
+    return request is not None and request.user.is_authenticated
+
+
+def represent_image(image, request):
+    '''Ссылка на картинку так же, как её отдаёт ImageField'''
+    if not image:
+        return None
+    url = image.url
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def represent_renditions(digest, request):
+    '''Ссылки на уменьшенные копии картинки рецепта'''
+    urls = rendition_urls(digest)
+    if urls is None or request is None:
+        return urls
+    return {
+        rendition: request.build_absolute_uri(url)
+        for rendition, url in urls.items()
+    }
+
+
+def represent_author(author, request):
+    '''Автор рецепта в формате UserSerializer'''
+    if hasattr(author, 'is_subscribed'):
+        is_subscribed = author.is_subscribed
+    elif is_authenticated(request):
+        is_subscribed = Follow.objects.filter(
+            user=author, follower=request.user
+        ).exists()
+    else:
+        is_subscribed = False
+    return OrderedDict((
+        ('email', author.email),
+        ('id', author.id),
+        ('username', author.username),
+        ('first_name', author.first_name),
+        ('last_name', author.last_name),
+        ('is_subscribed', is_subscribed),
+    ))
+
+
+def represent_tag(tag):
+    '''Тег в формате TagSerializer'''
+    return OrderedDict((
+        ('id', tag.id),
+        ('name', tag.name),
+        ('color', tag.color),
+        ('slug', tag.slug),
+    ))
+
+
+def represent_recipe_ingredient(recipe_ingredient):
+    '''Ингредиент рецепта в формате RecipeIngredientSerializer'''
+    ingredient = recipe_ingredient.ingredient
+    return OrderedDict((
+        ('id', ingredient.id),
+        ('name', ingredient.name),
+        ('amount', recipe_ingredient.amount),
+        ('measurement_unit', ingredient.measurement_unit),
+    ))
+
+
+def represent_recipe(recipe, request):
+    '''Рецепт в формате ShowRecipeSerializer без создания сериализаторов.
+
+    Рассчитан на рецепты из Recipe.objects.with_related(),
+    для остальных недостающие данные догружаются запросами.
+    '''
+    if hasattr(recipe, 'author_is_subscribed'):
+        recipe.author.is_subscribed = recipe.author_is_subscribed
+    if hasattr(recipe, 'is_favorited'):
+        is_favorited = recipe.is_favorited
+        is_in_shopping_cart = recipe.is_in_shopping_cart
+    elif is_authenticated(request):
+        is_favorited = Favorite.objects.filter(
+            user=request.user, recipes=recipe
+        ).exists()
+        is_in_shopping_cart = ShoppingCart.objects.filter(
+            user=request.user, recipes=recipe
+        ).exists()
+    else:
+        is_favorited = is_in_shopping_cart = False
+    return OrderedDict((
+        ('id', recipe.id),
+        ('ingredients', [
+            represent_recipe_ingredient(recipe_ingredient)
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        ]),
+        ('tags', [represent_tag(tag) for tag in recipe.tags.all()]),
+        ('is_favorited', is_favorited),
+        ('is_in_shopping_cart', is_in_shopping_cart),
+        ('author', represent_author(recipe.author, request)),
+        ('name', recipe.name),
+        ('image', represent_image(recipe.image, request)),
+        ('image_renditions', represent_renditions(recipe.image_hash, request)),
+        ('text', recipe.text),
+        ('cooking_time', recipe.cooking_time),
+    ))
@@ -1,13 +1,14 @@
-from collections import OrderedDict
-
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from .fields import StreamedBase64ImageField
 from .models import (Favorite, Follow, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Tag, User)
+from .representations import represent_recipe, represent_renditions
 
 
 class NewAuthTokenSerializer(serializers.Serializer):
@@ -76,6 +77,8 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, user):
         '''Проверка того, является ли пользователь нашим подписчиком'''
+        if hasattr(user, 'is_subscribed'):
+            return user.is_subscribed
         follower = self.context['request'].user
         if follower.is_authenticated:
             return Follow.objects.filter(user=user, follower=follower).exists()
@@ -124,9 +127,12 @@ class ShowRecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     author = UserSerializer(read_only=True)
+    image_renditions = serializers.SerializerMethodField()
 
     def get_is_favorited(self, obj):
         '''Проверка того, находится ли рецепт в избранном'''
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         if user.is_authenticated:
             return Favorite.objects.filter(user=user, recipes=obj).exists()
@@ -134,19 +140,28 @@ class ShowRecipeSerializer(serializers.ModelSerializer):
 
     def get_is_in_shopping_cart(self, obj):
         '''Проверка того, находится ли рецепт в списке покупок'''
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         if user.is_authenticated:
             return ShoppingCart.objects.filter(user=user, recipes=obj).exists()
         return False
 
+    def get_image_renditions(self, obj):
+        return represent_renditions(
+            obj.image_hash, self.context.get('request')
+        )
+
     class Meta:
         model = Recipe
-        fields = '__all__'
+        fields = ['id', 'ingredients', 'tags', 'is_favorited',
+                  'is_in_shopping_cart', 'author', 'name', 'image',
+                  'image_renditions', 'text', 'cooking_time']
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     '''Сериализатор создания рецепта'''
-    image = Base64ImageField(max_length=None, use_url=True)
+    image = StreamedBase64ImageField(max_length=None, use_url=True)
     ingredients = RecipeIngredientSerializer(source='recipe', many=True)
     author = serializers.ReadOnlyField()
 
@@ -155,6 +170,15 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ['author', 'name', 'image', 'text',
                   'tags', 'cooking_time', 'ingredients']
 
+    def save(self, **kwargs):
+        '''Сохранение рецепта с закрытием временного файла картинки'''
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
     def validate_cooking_time(self, attrs):
         if attrs > 0:
             return attrs
@@ -180,28 +204,71 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         '''Изменение сериализатора отображения'''
-        ret = OrderedDict()
-        fields = ShowRecipeSerializer(instance, context=self.context)
-
-        for field in fields:
-            attribute = field.get_attribute(instance)
-            if attribute is None:
-                ret[field.field_name] = None
-            else:
-                ret[field.field_name] = field.to_representation(attribute)
+        return represent_recipe(instance, self.context.get('request'))
 
-        return ret
+    def get_ingredients(self, ingredients):
+        '''Получение ингредиентов рецепта одним запросом'''
+        amounts = {
+            dict(ingredient)['ingredient']['id']: dict(ingredient)['amount']
+            for ingredient in ingredients
+        }
+        current_ingredients = Ingredient.objects.in_bulk(amounts)
+        if len(current_ingredients) != len(amounts):
+            raise Http404('Ингредиент не найден')
+        return {
+            current_ingredients[ingr_id]: amount
+            for ingr_id, amount in amounts.items()
+        }
 
     def add_ingredients(self, ingredients, recipes):
-        for ingredient in ingredients:
-            ingr_id = dict(ingredient)['ingredient']['id']
-            amount = dict(ingredient)['amount']
-            current_ingredient = get_object_or_404(Ingredient, id=ingr_id)
-            RecipeIngredient.objects.create(
-                ingredient=current_ingredient, recipe=recipes, amount=amount
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                ingredient=ingredient, recipe=recipes, amount=amount
             )
+            for ingredient, amount in self.get_ingredients(
+                ingredients
+            ).items()
+        )
         return recipes
 
+    def update_ingredients(self, ingredients, recipes):
+        '''Изменение только тех ингредиентов рецепта, что поменялись'''
+        new_ingredients = self.get_ingredients(ingredients)
+        new_amounts = {
+            ingredient.id: amount
+            for ingredient, amount in new_ingredients.items()
+        }
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipes
+            )
+        }
+        deleted = [
+            recipe_ingredient.id
+            for ingr_id, recipe_ingredient in current.items()
+            if ingr_id not in new_amounts
+        ]
+        if deleted:
+            RecipeIngredient.objects.filter(id__in=deleted).delete()
+        changed = []
+        for ingr_id, recipe_ingredient in current.items():
+            amount = new_amounts.get(ingr_id)
+            if amount is not None and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                ingredient=ingredient, recipe=recipes, amount=amount
+            )
+            for ingredient, amount in new_ingredients.items()
+            if ingredient.id not in current
+        )
+        return recipes
+
+    @transaction.atomic
     def create(self, validated_data):
         '''Создание рецепта'''
         validated_data['author'] = self.context['request'].user
@@ -211,22 +278,33 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipes.tags.set(tags)
         return self.add_ingredients(ingredients, recipes)
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        '''Обновление рецепта'''
+        '''Обновление рецепта.
+
+        Строка рецепта блокируется до конца транзакции, чтобы
+        одновременные изменения ингредиентов выполнялись по очереди.
+        '''
+        Recipe.objects.select_for_update().only('id').get(pk=instance.pk)
         ingredients = validated_data.pop('recipe')
         tags = validated_data.pop('tags')
         super().update(instance, validated_data)
         instance.tags.set(tags)
-        instance.ingredients.clear()
-        return self.add_ingredients(ingredients, instance)
+        return self.update_ingredients(ingredients, instance)
 
 
 class FollowRecipeSerialiser(serializers.ModelSerializer):
     '''Сериализатор рецепта для отображения при подписке'''
+    image_renditions = serializers.SerializerMethodField()
+
+    def get_image_renditions(self, obj):
+        return represent_renditions(
+            obj.image_hash, self.context.get('request')
+        )
 
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_renditions', 'cooking_time']
 
 
 class IngredientSerialiser(serializers.ModelSerializer):
@@ -252,24 +330,29 @@ class FollowSerializer(serializers.ModelSerializer):
 
     def get_recipes(self, user):
         '''Отображение рецептов того, на кого подписываемся'''
-        limit = self.context['request'].GET.get('recipes_limit')
-        if limit is not None:
-            limit = int(limit)
-            recipes = Recipe.objects.filter(author=user)[:limit]
+        if hasattr(user, 'recipe_previews'):
+            recipes = user.recipe_previews
         else:
-            recipes = Recipe.objects.filter(author=user)
+            limit = self.context['request'].GET.get('recipes_limit')
+            if limit is not None:
+                limit = int(limit)
+                recipes = Recipe.objects.filter(author=user)[:limit]
+            else:
+                recipes = Recipe.objects.filter(author=user)
         serializer = FollowRecipeSerialiser(recipes, many=True)
         return serializer.data
 
     def get_is_subscribed(self, user):
         '''Проверка того, является ли пользователь нашим подписчиком'''
+        if hasattr(user, 'is_subscribed'):
+            return user.is_subscribed
         follower = self.context['request'].user
         if follower.is_authenticated:
             return Follow.objects.filter(user=user, follower=follower).exists()
         return False
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+        return obj.recipes_count
 
     class Meta:
         model = User
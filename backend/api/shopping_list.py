@@ -0,0 +1,216 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics, ttfonts
+from reportlab.pdfgen import canvas
+
+FONTS_PATH = os.path.join(settings.BASE_DIR, 'api', 'fonts')
+FONTS = {
+    'Arial': 'arial.ttf',
+    'Arial-Bold': 'arialbd.ttf',
+}
+FONT = 'Arial'
+TITLE_FONT = 'Arial-Bold'
+FONT_SIZE = 14
+LINE_HEIGHT = 20
+MARGIN = 30
+TITLE_X, TITLE_Y = 250, 800
+FIRST_LINE_Y = 770
+BULLET = '• '
+SPOOL_MAX_SIZE = 1024 * 1024
+# Меняется вместе с оформлением документа, чтобы не отдавать старые ETag
+DOCUMENT_VERSION = 1
+
+_fonts_lock = threading.Lock()
+_fonts_registered = False
+
+
+def load_fonts():
+    '''Чтение и регистрация шрифтов в reportlab'''
+    for name, filename in FONTS.items():
+        pdfmetrics.registerFont(
+            ttfonts.TTFont(name, os.path.join(FONTS_PATH, filename))
+        )
+
+
+def register_fonts():
+    '''Регистрация шрифтов один раз на процесс'''
+    global _fonts_registered
+    if _fonts_registered:
+        return
+    with _fonts_lock:
+        if not _fonts_registered:
+            load_fonts()
+            _fonts_registered = True
+
+
+def ingredient_fields(ingredient):
+    return (
+        ingredient['ingredient__name'],
+        ingredient['ingredient__measurement_unit'],
+        ingredient['total'],
+    )
+
+
+def ingredient_lines(ingredient, max_width):
+    '''Строки пункта списка, перенесённые по ширине страницы'''
+    name, unit, total = ingredient_fields(ingredient)
+    text = f'{name}, ({unit}) - {total}'
+    indent = pdfmetrics.stringWidth(BULLET, FONT, FONT_SIZE)
+    lines = simpleSplit(text, FONT, FONT_SIZE, max_width - indent) or ['']
+    yield 0, BULLET + lines[0]
+    for line in lines[1:]:
+        yield indent, line
+
+
+def render_shopping_list(ingredients):
+    '''Список покупок в формате PDF.
+
+    ingredients - итерируемые строки с ключами ingredient__name,
+    ingredient__measurement_unit и total. Длинные списки разбиваются
+    на страницы, а документ собирается во временном файле, который
+    переносится на диск, если перестаёт помещаться в SPOOL_MAX_SIZE.
+    Память при этом не ограничена: reportlab держит все сжатые страницы
+    до save(), так что пик растёт вместе с размером документа.
+    '''
+    register_fonts()
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    p = canvas.Canvas(output, pagesize=A4, pageCompression=1)
+    width, height = A4
+    max_width = width - 2 * MARGIN
+    p.setFont(TITLE_FONT, FONT_SIZE)
+    p.drawString(TITLE_X, TITLE_Y, 'Список покупок:')
+    p.setFont(FONT, FONT_SIZE)
+    y = FIRST_LINE_Y
+    for ingredient in ingredients:
+        for indent, line in ingredient_lines(ingredient, max_width):
+            if y < MARGIN:
+                p.showPage()
+                p.setFont(FONT, FONT_SIZE)
+                y = height - MARGIN - FONT_SIZE
+            p.drawString(MARGIN + indent, y, line)
+            y -= LINE_HEIGHT
+    p.showPage()
+    p.save()
+    output.seek(0)
+    return output
+
+
+def iter_text(ingredients):
+    '''Список покупок простым текстом'''
+    yield 'Список покупок:\n'
+    for ingredient in ingredients:
+        name, unit, total = ingredient_fields(ingredient)
+        yield f'{BULLET}{name}, ({unit}) - {total}\n'
+
+
+class Echo:
+    '''Файлоподобный объект, который отдаёт записанную строку'''
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(ingredients):
+    '''Список покупок в формате CSV'''
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in ingredients:
+        yield writer.writerow(ingredient_fields(ingredient))
+
+
+def iter_json(ingredients):
+    '''Список покупок в формате JSON, по одному объекту за раз'''
+    yield '['
+    separator = ''
+    for ingredient in ingredients:
+        name, unit, total = ingredient_fields(ingredient)
+        item = {'name': name, 'measurement_unit': unit, 'amount': total}
+        yield separator + json.dumps(item, ensure_ascii=False)
+        separator = ', '
+    yield ']'
+
+
+STREAM_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', iter_text),
+    'csv': ('text/csv; charset=utf-8', iter_csv),
+    'json': ('application/json', iter_json),
+}
+
+
+def stream_shopping_list(ingredients, file_format):
+    '''Части списка покупок в заданном формате, закодированные в UTF-8'''
+    content_type, iter_format = STREAM_FORMATS[file_format]
+    return content_type, (
+        part.encode() for part in iter_format(ingredients)
+    )
+
+
+class DocumentCache:
+    '''LRU-кэш готовых документов, ограниченный суммарным размером'''
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.documents = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            content = self.documents.get(key)
+            if content is not None:
+                self.documents.move_to_end(key)
+            return content
+
+    def set(self, key, content):
+        if len(content) > self.max_size:
+            return
+        with self.lock:
+            if key in self.documents:
+                self.size -= len(self.documents.pop(key))
+            self.documents[key] = content
+            self.size += len(content)
+            while self.size > self.max_size:
+                _, evicted = self.documents.popitem(last=False)
+                self.size -= len(evicted)
+
+
+documents_cache = DocumentCache(
+    getattr(settings, 'SHOPPING_LIST_CACHE_SIZE', 32 * 1024 * 1024)
+)
+
+
+def shopping_list_key(ingredients):
+    '''Хеш содержимого списка покупок'''
+    rows = [ingredient_fields(ingredient) for ingredient in ingredients]
+    content = json.dumps([DOCUMENT_VERSION, rows], ensure_ascii=False)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_shopping_list(key, ingredients):
+    '''Готовый PDF из кэша или новый, если такого списка ещё не было.
+
+    Документ, который помещается в кэш, читается в память целиком и
+    сохраняется в кэше; больший отдаётся прямо из временного файла.
+    '''
+    content = documents_cache.get(key)
+    if content is not None:
+        return io.BytesIO(content)
+    document = render_shopping_list(ingredients)
+    size = document.seek(0, os.SEEK_END)
+    document.seek(0)
+    if size > documents_cache.max_size:
+        return document
+    content = document.read()
+    document.close()
+    documents_cache.set(key, content)
+    return io.BytesIO(content)
@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_tokens, forget_user_tokens
+from .catalog import bump_version
+from .counters import update_counters
+from .images import schedule_renditions
+from .models import (Favorite, Follow, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, Tag, User)
+
+# Поля пользователя, которые входят в ответ с рецептом
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def catalog_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def object_created(sender, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: bump_version(sender))
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def object_deleted(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+@receiver(post_save, sender=Recipe)
+def counted_object_created(sender, instance, created, **kwargs):
+    if created:
+        update_counters(instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+@receiver(post_delete, sender=Recipe)
+def counted_object_deleted(sender, instance, **kwargs):
+    update_counters(instance, -1)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    Recipe.objects.filter(pk=instance.recipe_id).touch()
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields and not AUTHOR_FIELDS & set(update_fields):
+        return
+    Recipe.objects.filter(author=instance).touch()
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: forget_user_tokens(instance))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: forget_tokens([instance.key]))
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_image_changed(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    previous = Recipe.objects.filter(pk=instance.pk).values_list(
+        'image', flat=True
+    ).first()
+    if previous != instance.image.name:
+        instance.image_hash = ''
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    if instance.image and not instance.image_hash:
+        schedule_renditions(instance.pk)
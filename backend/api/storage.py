@@ -0,0 +1,27 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    '''Хранилище, которое называет файлы по sha256 содержимого.
+
+    Одинаковые файлы сохраняются один раз: если файл с таким хешем уже
+    есть, возвращается его имя. Ссылка на файл известна сразу после
+    загрузки и больше не меняется.
+    '''
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        name = os.path.join(directory, digest.hexdigest() + extension)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
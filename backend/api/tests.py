@@ -0,0 +1,196 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from rest_framework.test import APIClient
+
+from .filters import CustomFilter
+from .models import (Favorite, Follow, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, User)
+from .throttling import LoginIPThrottle
+
+
+class UserRelationFilterTest(TestCase):
+    '''Фильтры избранного и списка покупок строят один запрос с EXISTS'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@x.ru',
+                first_name=f'first{number}', last_name=f'last{number}',
+                password='password'
+            )
+            for number in range(3)
+        ]
+        Recipe.objects.bulk_create(
+            Recipe(author=cls.users[number % 3], name=f'recipe{number}',
+                   text='text', cooking_time=5)
+            for number in range(60)
+        )
+        cls.recipes = list(Recipe.objects.order_by('id'))
+        for model, step in ((Favorite, 2), (ShoppingCart, 3)):
+            model.objects.bulk_create(
+                model(user=user, recipes=recipe)
+                for user in cls.users
+                for recipe in cls.recipes[::step]
+            )
+
+    def filter(self, name, value):
+        request = RequestFactory().get('/api/recipes/')
+        request.user = self.users[0]
+        return CustomFilter(
+            {name: value}, queryset=Recipe.objects.all(), request=request
+        ).qs
+
+    def test_single_exists_query(self):
+        cases = (
+            ('is_favorited', 'true', self.recipes[::2]),
+            ('is_favorited', 'false', self.recipes[1::2]),
+            ('is_in_shopping_cart', 'true', self.recipes[::3]),
+        )
+        for name, value, expected in cases:
+            with self.subTest(name=name, value=value):
+                queryset = self.filter(name, value)
+                self.assertEqual(str(queryset.query).count('EXISTS'), 1)
+                with self.assertNumQueries(1):
+                    ids = {recipe.id for recipe in queryset}
+                self.assertEqual(ids, {recipe.id for recipe in expected})
+
+    @skipUnless(connection.vendor == 'postgresql', 'EXPLAIN для PostgreSQL')
+    def test_index_scan(self):
+        cases = (
+            ('is_favorited', 'unique_favorite_recipe'),
+            ('is_in_shopping_cart', 'unique_shopping_cart_recipe'),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for name, index in cases:
+            for value in ('true', 'false'):
+                with self.subTest(name=name, value=value):
+                    plan = self.filter(name, value).explain()
+                    self.assertIn(index, plan)
+
+
+class RecipeValidatorsTest(TestCase):
+    '''ETag рецепта меняется вместе с ингредиентами и автором'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@x.ru', first_name='first',
+            last_name='last', password='password'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='recipe', text='text', cooking_time=5
+        )
+        ingredient = Ingredient.objects.create(
+            name='salt', measurement_unit='г'
+        )
+        cls.recipe_ingredient = RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=ingredient, amount=1
+        )
+
+    def assert_changed(self, change):
+        url = f'/api/recipes/{self.recipe.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        change()
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_recipe_ingredient_change(self):
+        def change():
+            self.recipe_ingredient.amount = 2
+            self.recipe_ingredient.save()
+        self.assert_changed(change)
+
+    def test_author_change(self):
+        def change():
+            self.author.first_name = 'other'
+            self.author.save(update_fields=['first_name'])
+        self.assert_changed(change)
+
+
+class CountersSaveTest(TestCase):
+    '''Полное сохранение объекта не затирает счётчики'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@x.ru',
+                first_name=f'first{number}', last_name=f'last{number}',
+                password='password'
+            )
+            for number in range(2)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.users[0], name='recipe', text='text', cooking_time=5
+        )
+
+    def test_stale_user_save(self):
+        user = User.objects.get(pk=self.users[0].pk)
+        Follow.objects.create(user=self.users[0], follower=self.users[1])
+        user.first_name = 'other'
+        user.save()
+        user.refresh_from_db()
+        self.assertEqual(
+            (user.first_name, user.recipes_count, user.followers_count),
+            ('other', 1, 1)
+        )
+
+    def test_stale_recipe_save(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Favorite.objects.create(user=self.users[1], recipes=self.recipe)
+        recipe.name = 'other'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(
+            (recipe.name, recipe.favorites_count), ('other', 1)
+        )
+
+    def test_set_password_keeps_counters(self):
+        user = User.objects.get(pk=self.users[0].pk)
+        Follow.objects.create(user=self.users[0], follower=self.users[1])
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/users/set_password/', {
+            'current_password': 'password',
+            'new_password': 'new-Passw0rd-123',
+        })
+        self.assertEqual(response.status_code, 204)
+        user.refresh_from_db()
+        self.assertEqual((user.recipes_count, user.followers_count), (1, 1))
+        self.assertTrue(user.check_password('new-Passw0rd-123'))
+
+
+class LoginThrottleTest(TestCase):
+    '''Ограничение попыток входа'''
+
+    def test_non_object_body(self):
+        response = APIClient().post(
+            '/api/auth/token/login/', [1, 2], format='json',
+            REMOTE_ADDR='10.1.0.1'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_concurrent_requests(self):
+        class Throttle(LoginIPThrottle):
+            rate = '5/min'
+
+        request = RequestFactory().post('/', REMOTE_ADDR='10.1.0.2')
+        barrier = threading.Barrier(20)
+
+        def attempt():
+            barrier.wait()
+            return Throttle().allow_request(request, None)
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(executor.map(lambda _: attempt(), range(20)))
+        self.assertEqual(results.count(True), 5)
@@ -0,0 +1,84 @@
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    '''Ограничение запросов скользящим окном на счётчиках в кэше.
+
+    Запросы считаются в окнах длиной в период; число запросов за
+    последний период оценивается по текущему окну и доле предыдущего.
+    Счётчик меняется только атомарными cache.add и cache.incr, поэтому
+    одновременные запросы не проходят сверх лимита. Проверка
+    выполняется до вызова представления, то есть до проверки пароля.
+    '''
+    cache = caches['throttle']
+
+    def get_ident_key(self, ident):
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def increment(self, key):
+        self.cache.add(key, 0, 2 * self.duration)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, 2 * self.duration)
+            return 1
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        window, self.offset = divmod(self.timer(), self.duration)
+        current = f'{self.key}:{int(window)}'
+        count = self.increment(current)
+        previous = self.cache.get(f'{self.key}:{int(window) - 1}', 0)
+        weight = 1 - self.offset / self.duration
+        if previous * weight + count <= self.num_requests:
+            return True
+        try:
+            self.cache.decr(current)
+        except ValueError:
+            pass
+        return False
+
+    def wait(self):
+        return self.duration - self.offset
+
+
+class LoginIPThrottle(SlidingWindowThrottle):
+    '''Попытки входа с одного адреса'''
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.get_ident_key(self.get_ident(request))
+
+
+class LoginEmailThrottle(SlidingWindowThrottle):
+    '''Попытки входа в одну учётную запись'''
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.data, dict):
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email:
+            return None
+        return self.get_ident_key(email.strip().lower())
+
+
+class RegistrationThrottle(SlidingWindowThrottle):
+    '''Регистрации с одного адреса'''
+    scope = 'registration'
+
+    def get_cache_key(self, request, view):
+        return self.get_ident_key(self.get_ident(request))
+
+
+class PasswordThrottle(SlidingWindowThrottle):
+    '''Попытки смены пароля одним пользователем'''
+    scope = 'password'
+
+    def get_cache_key(self, request, view):
+        return self.get_ident_key(request.user.pk)
@@ -1,34 +1,40 @@
-import io
-
-from django.conf import settings
-from django.http import FileResponse
+from django.db import transaction
+from django.db.models import BooleanField, Sum, Value
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import (get_conditional_response,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from reportlab.pdfbase import pdfmetrics, ttfonts
-from reportlab.pdfgen import canvas
 from rest_framework import mixins, status, viewsets
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .catalog import catalog_response, get_version, ingredient_index
 from .filters import CustomFilter
 from .models import (Favorite, Follow, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Tag, User)
+from .negotiation import FileFormatNegotiation
 from .pagination import CustomPaginator
 from .permissions import CustomPermission
 from .serializers import (ChangePasswordSerializer, FollowRecipeSerialiser,
                           FollowSerializer, IngredientSerialiser,
                           NewAuthTokenSerializer, RecipeSerializer,
                           TagSerializer, UserRegSerializer, UserSerializer)
+from .shopping_list import (STREAM_FORMATS, get_shopping_list,
+                            shopping_list_key, stream_shopping_list)
+from .throttling import (LoginEmailThrottle, LoginIPThrottle,
+                         PasswordThrottle, RegistrationThrottle)
 
 
 class NewObtainAuthToken(APIView):
     '''Класс получение токена'''
     serializer_class = NewAuthTokenSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
 
     def post(self, request, *args, **kwargs):
         serializer = NewAuthTokenSerializer(data=request.data)
@@ -49,6 +55,11 @@ class UserView(mixins.ListModelMixin,
     pagination_class = CustomPaginator
     permission_classes = [AllowAny]
 
+    def get_throttles(self):
+        if self.action == 'create':
+            return [RegistrationThrottle()]
+        return super().get_throttles()
+
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
 
@@ -82,11 +93,21 @@ class UserView(mixins.ListModelMixin,
     )
     def subscriptions(self, request, *args, **kwargs):
         '''Отображение подписок'''
-        follower = request.user
-        followers = Follow.objects.filter(follower=follower)
-        users = User.objects.filter(following__in=followers)
+        users = User.objects.filter(following__follower=request.user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).order_by('id')
 
         page = self.paginate_queryset(users)
+        limit = request.GET.get('recipes_limit')
+        recipes = Recipe.objects.latest_by_author(
+            page, [*FollowRecipeSerialiser.Meta.fields, 'image_hash'],
+            None if limit is None else int(limit)
+        )
+        previews = {user.id: [] for user in page}
+        for recipe in recipes:
+            previews[recipe.author_id].append(recipe)
+        for user in page:
+            user.recipe_previews = previews[user.id]
         serializer = FollowSerializer(
             page, many=True, context={'request': request}
         )
@@ -112,7 +133,8 @@ class UserView(mixins.ListModelMixin,
                     status=status.HTTP_400_BAD_REQUEST
                 )
             else:
-                Follow.objects.create(user=user, follower=follower)
+                with transaction.atomic():
+                    Follow.objects.create(user=user, follower=follower)
                 serializer = FollowSerializer(
                     user, context={'request': request}
                 )
@@ -130,11 +152,12 @@ class UserView(mixins.ListModelMixin,
                 )
 
     @action(
-        methods=['post'], detail=False, permission_classes=[IsAuthenticated]
+        methods=['post'], detail=False, permission_classes=[IsAuthenticated],
+        throttle_classes=[PasswordThrottle]
     )
     def set_password(self, request, *args, **kwargs):
         '''Изменение пароля'''
-        obj = request.user
+        obj = get_object_or_404(User, pk=request.user.pk)
         serializer = ChangePasswordSerializer(data=request.data)
 
         serializer.is_valid(raise_exception=True)
@@ -143,7 +166,7 @@ class UserView(mixins.ListModelMixin,
             return Response({'current_password': ['Wrong password.']},
                             status=status.HTTP_400_BAD_REQUEST)
         obj.set_password(serializer.validated_data['new_password'])
-        obj.save()
+        obj.save(update_fields=['password'])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -160,10 +183,54 @@ class RecipeView(mixins.CreateModelMixin,
     filter_backends = (DjangoFilterBackend,)
     filterset_class = CustomFilter
 
+    def get_queryset(self):
+        return Recipe.objects.with_related(self.request.user)
+
+    def perform_create(self, serializer):
+        recipe = serializer.save()
+        serializer.instance = self.get_queryset().get(pk=recipe.pk)
+
+    def perform_update(self, serializer):
+        recipe = serializer.save()
+        serializer.instance = self.get_queryset().get(pk=recipe.pk)
+
+    def get_validators(self, recipe):
+        '''ETag и дата изменения рецепта для условных запросов.
+
+        В ETag входят признаки рецепта для текущего пользователя и версии
+        справочников, поэтому их изменение тоже обновляет ответ. Дата
+        изменения отдаётся только анонимным пользователям: по ней одной
+        нельзя понять, что поменялось избранное или список покупок.
+        '''
+        flags = ''.join(
+            str(int(getattr(recipe, name, False)))
+            for name in ('is_favorited', 'is_in_shopping_cart',
+                         'author_is_subscribed')
+        )
+        etag = quote_etag('-'.join((
+            str(recipe.id), str(recipe.updated_at.timestamp()), flags,
+            str(get_version(Tag)), str(get_version(Ingredient))
+        )))
+        if self.request.user.is_authenticated:
+            return etag, None
+        return etag, int(recipe.updated_at.timestamp())
+
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        serializer = RecipeSerializer(instance, context={'request': request})
-        return Response(serializer.data)
+        etag, last_modified = self.get_validators(instance)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            serializer = RecipeSerializer(
+                instance, context={'request': request}
+            )
+            response = Response(serializer.data)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
 
     @action(
         methods=['get', 'delete'], detail=True,
@@ -180,7 +247,8 @@ class RecipeView(mixins.CreateModelMixin,
                     status=status.HTTP_400_BAD_REQUEST
                 )
             else:
-                Favorite.objects.create(user=user, recipes=recipe)
+                with transaction.atomic():
+                    Favorite.objects.create(user=user, recipes=recipe)
                 serializer = FollowRecipeSerialiser(
                     recipe, context={'request': request}
                 )
@@ -212,7 +280,8 @@ class RecipeView(mixins.CreateModelMixin,
                     status=status.HTTP_400_BAD_REQUEST
                 )
             else:
-                ShoppingCart.objects.create(user=user, recipes=recipe)
+                with transaction.atomic():
+                    ShoppingCart.objects.create(user=user, recipes=recipe)
                 serializer = FollowRecipeSerialiser(
                     recipe, context={'request': request}
                 )
@@ -231,48 +300,47 @@ class RecipeView(mixins.CreateModelMixin,
 
     @action(
         methods=['get', 'delete'], detail=False,
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        content_negotiation_class=FileFormatNegotiation
     )
     def download_shopping_cart(self, request, *args, **kwargs):
-        '''Скачивание списка покупок в формате PDF'''
+        '''Скачивание списка покупок в формате PDF, TXT, CSV или JSON'''
         user = request.user
-        shop_obj = ShoppingCart.objects.filter(user=user)
-        recipes = Recipe.objects.filter(cart_recipes__in=shop_obj)
+        file_format = request.query_params.get('format', 'pdf')
+        if file_format != 'pdf' and file_format not in STREAM_FORMATS:
+            return Response(
+                {'errors': 'Неизвестный формат списка покупок'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         ingredients = (
-            RecipeIngredient.objects.filter(recipe__in=recipes).values_list(
-                'amount', 'ingredient__name', 'ingredient__measurement_unit')
+            RecipeIngredient.objects.filter(recipe__cart_recipes__user=user)
+            .values('ingredient__name', 'ingredient__measurement_unit')
+            .annotate(total=Sum('amount'))
+            .order_by('ingredient__name', 'ingredient__measurement_unit')
         )
-        cart = {}
-
-        for ingredient in ingredients:
-            amount, name, unit = ingredient
-            if f'{name}, ({unit})' in cart:
-                cart[f'{name}, ({unit})'] += amount
-            else:
-                cart[f'{name}, ({unit})'] = amount
+        if file_format in STREAM_FORMATS:
+            content_type, content = stream_shopping_list(
+                ingredients.iterator(), file_format
+            )
+            response = StreamingHttpResponse(
+                content, content_type=content_type
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename="shopping_cart.{file_format}"'
+            )
+            return response
 
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer)
-        fonts_path = (str(settings.BASE_DIR) + '/api/fonts/')
-        pdfmetrics.registerFont(
-            ttfonts.TTFont('Arial', f'{fonts_path}arial.ttf')
-        )
-        pdfmetrics.registerFont(
-            ttfonts.TTFont('Arial-Bold', f'{fonts_path}arialbd.ttf')
-        )
-        p.setFont('Arial-Bold', 14)
-        p.drawString(250, 800, 'Список покупок:')
-        x, y = 30, 770
-        p.setFont('Arial', 14)
-        for elem in cart:
-            p.drawString(x, y, f'• {elem} - {cart[elem]}')
-            y -= 20
-        p.showPage()
-        p.save()
-        buffer.seek(0)
-        return FileResponse(
-            buffer, as_attachment=True, filename='shopping_cart.pdf'
-        )
+        ingredients = list(ingredients)
+        key = shopping_list_key(ingredients)
+        etag = quote_etag(key)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = FileResponse(
+                get_shopping_list(key, ingredients),
+                as_attachment=True, filename='shopping_cart.pdf'
+            )
+        response['ETag'] = etag
+        return response
 
 
 class TagsView(viewsets.ModelViewSet):
@@ -280,10 +348,20 @@ class TagsView(viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
+    def list(self, request, *args, **kwargs):
+        return catalog_response(request, Tag, self.get_serializer_class())
+
 
 class IngredientsView(viewsets.ModelViewSet):
     '''Класс работы с ингредиентами'''
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerialiser
-    filter_backends = (SearchFilter,)
-    search_fields = ('name',)
+    filter_backends = ()
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return catalog_response(
+                request, Ingredient, self.get_serializer_class()
+            )
+        return Response(ingredient_index.search(name))
@@ -78,18 +78,61 @@ DATABASES = {
     }
 }
 
+# Общий для всех процессов кэш. Версии справочников и токены дополнительно
+# запоминаются в процессе, поэтому к нему обращаются редко; для большой
+# нагрузки его можно заменить на memcached через CACHE_BACKEND/CACHE_LOCATION
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'django_cache'),
+    },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens',
+    },
+    # Счётчикам ограничений нужен атомарный incr: он есть у LocMemCache
+    # (лимиты в пределах процесса) и у memcached (общие лимиты),
+    # но не у DatabaseCache
+    'throttle': {
+        'BACKEND': os.getenv(
+            'THROTTLE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('THROTTLE_CACHE_LOCATION', 'throttle'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
 AUTH_USER_MODEL = 'api.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
-    'SEARCH_PARAM': 'name'
+    'SEARCH_PARAM': 'name',
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv('THROTTLE_LOGIN_IP', '30/min'),
+        'login_email': os.getenv('THROTTLE_LOGIN_EMAIL', '5/min'),
+        'registration': os.getenv('THROTTLE_REGISTRATION', '10/hour'),
+        'password': os.getenv('THROTTLE_PASSWORD', '5/min'),
+    },
 }
 
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 30))
+
+# Сколько секунд процесс доверяет прочитанной из общего кэша версии справочника
+CATALOG_VERSION_TTL = int(os.getenv('CATALOG_VERSION_TTL', 5))
+
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 60)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -120,3 +163,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static_backend')
 
 MEDIA_URL = '/media_backend/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media_backend')
+
+IMAGE_RENDITION_WORKERS = int(os.getenv('IMAGE_RENDITION_WORKERS', 2))
+
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.getenv('MAX_IMAGE_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', 40_000_000))